@@ -1,7 +1,11 @@
+import sys
+
 import fire  # type: ignore[import-untyped]
 import uvicorn
 
 from media_symlink_manager_server import app
+from media_symlink_manager_server.backup import gzip_stream, import_tv_stream, iter_tv_export_lines
+from media_symlink_manager_server.dependencies import setup_db_from_env
 
 
 def cmd(host: str = "0.0.0.0", port: int = 80) -> None:
@@ -12,5 +16,40 @@ def cmd(host: str = "0.0.0.0", port: int = 80) -> None:
     )
 
 
+def export_cmd(path: str = "-", gzip: bool = False) -> None:
+    """Export the library as NDJSON to a file, or stdout with "-". Compressed if gzip or path ends with .gz."""
+    setup_db_from_env()
+    chunks = iter_tv_export_lines()
+    if gzip or path.endswith(".gz"):
+        chunks = gzip_stream(chunks)
+    if path == "-":
+        for chunk in chunks:
+            sys.stdout.buffer.write(chunk)
+        sys.stdout.buffer.flush()
+        return
+    with open(path, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+
+
+def import_cmd(path: str = "-") -> None:
+    """Import an NDJSON library export, plain or gzip compressed, from a file or stdin with "-"."""
+    setup_db_from_env()
+    try:
+        if path == "-":
+            imported = import_tv_stream(iter(lambda: sys.stdin.buffer.read(64 * 1024), b""))
+        else:
+            with open(path, "rb") as f:
+                imported = import_tv_stream(iter(lambda: f.read(64 * 1024), b""))
+    except ValueError as e:
+        sys.exit(f"Import failed: {e}")
+    print(f"Imported {imported} TV shows", file=sys.stderr)
+
+
+COMMANDS = {"export": export_cmd, "import": import_cmd}
+
 if __name__ == "__main__":
-    fire.Fire(cmd)
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        fire.Fire(COMMANDS)
+    else:
+        fire.Fire(cmd)
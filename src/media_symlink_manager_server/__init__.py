@@ -1,3 +1,4 @@
+import os
 from contextlib import asynccontextmanager
 from typing import AsyncIterator
 
@@ -5,14 +6,19 @@ from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 from starlette.staticfiles import StaticFiles
 
+from media_symlink_manager_server import settings as app_settings
 from media_symlink_manager_server.dependencies import setup_db_from_env
 from media_symlink_manager_server.routers import tv, fs, settings
+from media_symlink_manager_server.watcher import start_source_watcher, stop_source_watcher
 
 
 @asynccontextmanager
 async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
     setup_db_from_env()
+    if app_settings.WATCH_SOURCE_FILES:
+        start_source_watcher()
     yield
+    stop_source_watcher()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -23,4 +29,6 @@ app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], all
 app.include_router(tv.router, prefix="/api")
 app.include_router(fs.router, prefix="/api")
 app.include_router(settings.router, prefix="/api")
-app.mount("/", StaticFiles(packages=[__name__], html=True))
+# The web build output is only bundled by the full build
+if os.path.isdir(os.path.join(os.path.dirname(__file__), "statics")):
+    app.mount("/", StaticFiles(packages=[__name__], html=True))
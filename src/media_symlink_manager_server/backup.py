@@ -0,0 +1,198 @@
+import zlib
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from pony.orm import db_session  # type: ignore[import-untyped]
+
+from media_symlink_manager_server.models import TvModel
+from media_symlink_manager_server.schemas import Tv
+from media_symlink_manager_server.search import index_tv
+
+EXPORT_CHUNK_SIZE = 200
+IMPORT_BATCH_SIZE = 200
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def iter_tv_export_lines(chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Export all TV shows as NDJSON lines, one show per line, ordered by TMDB ID.
+
+    Rows are read in chunks by keyset pagination, each chunk in its own db_session,
+    so memory stays constant and no transaction is held open between chunks.
+
+    Args:
+        chunk_size: Number of rows read per query
+    """
+    last_tmdb_id = 0
+    while True:
+        with db_session:
+            models = TvModel.select(lambda m: m.tmdb_id > last_tmdb_id).order_by(TvModel.tmdb_id)[:chunk_size]
+            if not models:
+                return
+            lines = [Tv.model_validate(m).model_dump_json().encode() + b"\n" for m in models]
+            last_tmdb_id = models[-1].tmdb_id
+        yield b"".join(lines)
+
+
+def gzip_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# An NDJSON line and its 1-based line number in the input
+NumberedLine = Tuple[int, bytes]
+
+
+class NdjsonDecoder:
+    """
+    Splits a byte stream into NDJSON lines, transparently decompressing gzip input.
+
+    Blank lines are skipped but still counted, so line numbers match the (decompressed) input.
+    """
+
+    def __init__(self) -> None:
+        self._head = b""
+        self._detected = False
+        self._decompressor: Optional["zlib._Decompress"] = None
+        self._buffer = b""
+        self._line_count = 0
+
+    def feed(self, chunk: bytes) -> List[NumberedLine]:
+        if not self._detected:
+            self._head += chunk
+            if len(self._head) < len(GZIP_MAGIC):
+                return []
+            chunk, self._head = self._head, b""
+            self._detected = True
+            if chunk.startswith(GZIP_MAGIC):
+                self._decompressor = zlib.decompressobj(wbits=31)
+
+        if self._decompressor is not None:
+            chunk = self._decompress(chunk)
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split(b"\n")
+        return self._number(lines)
+
+    def _decompress(self, data: bytes) -> bytes:
+        """Decompress gzip data, including streams of several concatenated gzip members."""
+        assert self._decompressor is not None
+        output = []
+        try:
+            while data:
+                if self._decompressor.eof:
+                    self._decompressor = zlib.decompressobj(wbits=31)
+                output.append(self._decompressor.decompress(data))
+                data = self._decompressor.unused_data if self._decompressor.eof else b""
+        except zlib.error:
+            raise ValueError("Invalid gzip stream")
+        return b"".join(output)
+
+    def _number(self, lines: List[bytes]) -> List[NumberedLine]:
+        numbered = []
+        for line in lines:
+            self._line_count += 1
+            if line.strip():
+                numbered.append((self._line_count, line))
+        return numbered
+
+    def flush(self) -> List[NumberedLine]:
+        if self._decompressor is not None and not self._decompressor.eof:
+            raise ValueError("Truncated gzip stream")
+        rest = self._buffer if self._detected else self._head
+        self._buffer = self._head = b""
+        return self._number(rest.split(b"\n"))
+
+
+class ImportBatcher:
+    """
+    Decodes an NDJSON byte stream and groups its lines into batches for import_tv_lines().
+
+    Only does the parsing, so the same batcher serves blocking and async streams alike.
+    """
+
+    def __init__(self, batch_size: int = IMPORT_BATCH_SIZE) -> None:
+        self._decoder = NdjsonDecoder()
+        self._batch_size = batch_size
+        self._pending: List[NumberedLine] = []
+
+    def feed(self, chunk: bytes) -> List[List[NumberedLine]]:
+        """Returns the batches completed by chunk."""
+        self._pending.extend(self._decoder.feed(chunk))
+        return self._take(self._batch_size)
+
+    def flush(self) -> List[List[NumberedLine]]:
+        """Returns the remaining batches at the end of the stream."""
+        self._pending.extend(self._decoder.flush())
+        return self._take(1)
+
+    def _take(self, min_size: int) -> List[List[NumberedLine]]:
+        batches = []
+        while len(self._pending) >= min_size:
+            batches.append(self._pending[: self._batch_size])
+            self._pending = self._pending[self._batch_size :]
+        return batches
+
+
+def import_tv_lines(lines: List[NumberedLine]) -> int:
+    """
+    Upsert a batch of exported NDJSON lines in a single transaction.
+
+    Args:
+        lines: NDJSON lines with their line numbers, one TV show per line
+
+    Returns:
+        Number of imported TV shows
+
+    Raises:
+        ValueError: When a line is not a valid TV show, nothing of the batch is imported
+    """
+    tvs = []
+    for line_number, line in lines:
+        try:
+            tvs.append(Tv.model_validate_json(line))
+        except ValueError as e:
+            raise ValueError(f"Invalid line {line_number}") from e
+
+    tmdb_ids = [tv.tmdb_id for tv in tvs]
+    with db_session:
+        existing = {m.tmdb_id: m for m in TvModel.select(lambda m: m.tmdb_id in tmdb_ids)}
+        for tv in tvs:
+            m = existing.get(tv.tmdb_id)
+            if m is None:
+                # Later lines with the same TMDB ID update this model, the last one wins
+                m = existing[tv.tmdb_id] = tv.to_model()
+            else:
+                m.set(
+                    name=tv.name,
+                    year=tv.year,
+                    tmdb_tv=tv.tmdb_tv,
+                    tmdb_seasons=tv.tmdb_seasons,
+                    filepath_mapping=tv.filepath_mapping,
+                    created_at=tv.created_at,
+                )
+            index_tv(m)
+    return len(tvs)
+
+
+def import_tv_stream(chunks: Iterable[bytes], batch_size: int = IMPORT_BATCH_SIZE) -> int:
+    """
+    Import an NDJSON (optionally gzip compressed) byte stream, upserting in batches.
+
+    Args:
+        chunks: Raw byte chunks of the stream
+        batch_size: Number of TV shows upserted per transaction
+
+    Returns:
+        Number of imported TV shows
+    """
+    batcher = ImportBatcher(batch_size)
+    imported = 0
+    for chunk in chunks:
+        for batch in batcher.feed(chunk):
+            imported += import_tv_lines(batch)
+    for batch in batcher.flush():
+        imported += import_tv_lines(batch)
+    return imported
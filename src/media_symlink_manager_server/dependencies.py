@@ -2,6 +2,7 @@ import os
 from functools import lru_cache
 
 from media_symlink_manager_server.db import db
+from media_symlink_manager_server.search import setup_tv_search_index
 from media_symlink_manager_server.tmdb_client.client import TmdbClient
 
 DEFAULT_DB_PATH = "/data/media_symlink_manager_server.db"
@@ -21,3 +22,4 @@ def setup_db_from_env() -> None:
     db_path = os.getenv("DB_PATH", DEFAULT_DB_PATH)
     db.bind(provider="sqlite", filename=db_path, create_db=True)
     db.generate_mapping(create_tables=True)
+    setup_tv_search_index()
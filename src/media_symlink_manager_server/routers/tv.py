@@ -1,20 +1,33 @@
-import os
-from dataclasses import dataclass
 from typing import List, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from pony.orm import db_session, desc  # type: ignore[import-untyped]
-
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+
+from media_symlink_manager_server.backup import (
+    ImportBatcher,
+    gzip_stream,
+    import_tv_lines,
+    iter_tv_export_lines,
+)
 from media_symlink_manager_server.dependencies import tmdb_client_from_env
 from media_symlink_manager_server.models import TvModel
-from media_symlink_manager_server.schemas import Tv, TvListItem, TvFilepathMapping
+from media_symlink_manager_server.schemas import Tv, TvListItem, TvFilepathMapping, TvSearchResult, TvImportResult
+from media_symlink_manager_server.search import index_tv, unindex_tv, search_tv_index
+from media_symlink_manager_server.symlinks import (
+    SymlinkBatchError,
+    build_tv_symlink_tasks,
+    create_symlinks_atomic,
+    get_episode_key,
+)
 from media_symlink_manager_server.tmdb_client.client import TmdbClient
 from media_symlink_manager_server.tmdb_client.requests import (
     RequestSearchTv,
     RequestGetTvDetails,
     RequestGetTvSeasonDetails,
 )
-from media_symlink_manager_server.utils import avoid_invalid_filename_chars
+from media_symlink_manager_server.watcher import notify_filepath_mapping_changed
 
 router = APIRouter()
 
@@ -41,7 +54,7 @@ async def add_tv(
         filepath_mapping=init_filepath_mapping(tmdb_seasons),
     )
     with db_session:
-        tv.to_model()
+        index_tv(tv.to_model())
 
 
 @router.get("/tv")
@@ -50,6 +63,58 @@ async def list_tv() -> List[TvListItem]:
         return [TvListItem.model_validate(m) for m in TvModel.select().order_by(desc(TvModel.created_at))]
 
 
+@router.get("/tv:search")
+async def search_tv(
+    query: str,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+) -> TvSearchResult:
+    with db_session:
+        total, tmdb_ids = search_tv_index(query, offset=(page - 1) * page_size, limit=page_size)
+        models = {m.tmdb_id: m for m in TvModel.select(lambda m: m.tmdb_id in tmdb_ids)} if tmdb_ids else {}
+        items = [TvListItem.model_validate(models[i]) for i in tmdb_ids if i in models]
+    return TvSearchResult(total=total, page=page, page_size=page_size, items=items)
+
+
+@router.get("/tv:export")
+async def export_tv(gzip: bool = False) -> StreamingResponse:
+    # Sync iterators are consumed in the threadpool, so the export does not block the event loop
+    if gzip:
+        return StreamingResponse(
+            gzip_stream(iter_tv_export_lines()),
+            media_type="application/gzip",
+            headers={"Content-Disposition": 'attachment; filename="tv.ndjson.gz"'},
+        )
+    return StreamingResponse(
+        iter_tv_export_lines(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="tv.ndjson"'},
+    )
+
+
+@router.post("/tv:import")
+async def import_tv(request: Request) -> TvImportResult:
+    batcher = ImportBatcher()
+    imported = 0
+    try:
+        async for chunk in request.stream():
+            for batch in batcher.feed(chunk):
+                imported += await run_in_threadpool(import_tv_lines, batch)
+        for batch in batcher.flush():
+            imported += await run_in_threadpool(import_tv_lines, batch)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            headers={
+                "X-Error": f"{e}, {imported} imported before it",
+                "Access-Control-Expose-Headers": "X-Error",
+            },
+        )
+    finally:
+        notify_filepath_mapping_changed()
+    return TvImportResult(imported=imported)
+
+
 @router.get("/tv/{tmdb_id}")
 async def get_tv(tmdb_id: int) -> Tv:
     with db_session:
@@ -75,6 +140,7 @@ async def update_tv_filepath_mapping(
                 headers={"X-Error": "Not Found", "Access-Control-Expose-Headers": "X-Error"},
             )
         m.filepath_mapping = filepath_mapping
+    notify_filepath_mapping_changed()
 
 
 @router.delete("/tv/{tmdb_id}", status_code=204)
@@ -87,6 +153,8 @@ async def delete_tv(tmdb_id: int) -> None:
                 headers={"X-Error": "Not Found", "Access-Control-Expose-Headers": "X-Error"},
             )
         m.delete()
+        unindex_tv(tmdb_id)
+    notify_filepath_mapping_changed()
 
 
 @router.post("/tv/{tmdb_id}:apply", status_code=204)
@@ -103,69 +171,6 @@ async def apply(tmdb_id: int) -> None:
 
 
 # region Helper functions
-@dataclass
-class SymlinkTask:
-    """Represents a symlink creation task."""
-    src: str  # Source file path
-    dst: str  # Destination symlink path
-
-
-class SymlinkBatchError(Exception):
-    """Raised when batch symlink creation fails due to file conflicts."""
-    def __init__(self, conflicts: List[str]):
-        self.conflicts = conflicts
-        super().__init__(f"Files already exist: {conflicts}")
-
-
-def create_symlinks_atomic(tasks: List[SymlinkTask]) -> None:
-    """
-    Atomically create symlinks in batch.
-
-    - Fails if any target path is a regular file (non-symlink)
-    - Allows overwriting symlinks or creating new ones
-
-    Args:
-        tasks: List of symlink creation tasks
-
-    Raises:
-        SymlinkBatchError: When regular file conflicts are detected
-    """
-    # Phase 1: Validate all target paths
-    conflicts = []
-    for task in tasks:
-        if os.path.lexists(task.dst) and not os.path.islink(task.dst):
-            conflicts.append(task.dst)
-
-    if conflicts:
-        raise SymlinkBatchError(conflicts)
-
-    # Phase 2: Execute all symlink operations
-    created = []
-    try:
-        for task in tasks:
-            # Ensure destination directory exists
-            dst_dir = os.path.dirname(task.dst)
-            if dst_dir:
-                os.makedirs(dst_dir, exist_ok=True)
-
-            # Remove existing symlink
-            if os.path.islink(task.dst):
-                os.remove(task.dst)
-
-            # Create new symlink
-            os.symlink(task.src, task.dst)
-            created.append(task.dst)
-    except OSError:
-        # Rollback created symlinks
-        for dst in created:
-            try:
-                if os.path.islink(dst):
-                    os.remove(dst)
-            except OSError:
-                pass
-        raise
-
-
 def apply_tv_symlinks(tv: Tv) -> None:
     """
     Apply TV show symlinks based on filepath mapping.
@@ -176,29 +181,7 @@ def apply_tv_symlinks(tv: Tv) -> None:
     Raises:
         HTTPException: 409 when file conflicts are detected
     """
-    base_dir = tv.filepath_mapping["base_dir"]
-    mappings = tv.filepath_mapping["mappings"]
-    tv_dirname = avoid_invalid_filename_chars(f"{tv.name} ({tv.year})")
-
-    # Collect all symlink tasks
-    tasks: List[SymlinkTask] = []
-
-    for season in tv.tmdb_seasons:
-        season_dirname = f"Season {season['season_number']:02d}"
-        season_dirpath = os.path.join(base_dir, tv_dirname, season_dirname)
-
-        for episode in season["episodes"]:
-            key = get_episode_key(episode)
-            src = mappings.get(key, "")
-            if src == "":
-                continue
-
-            ext = os.path.splitext(src)[1]
-            dst = os.path.join(
-                season_dirpath,
-                avoid_invalid_filename_chars(f"{tv.name} ({tv.year}) - {key} - {episode['name']}{ext}"),
-            )
-            tasks.append(SymlinkTask(src=src, dst=dst))
+    tasks = build_tv_symlink_tasks(tv)
 
     # Execute atomically
     try:
@@ -252,8 +235,4 @@ def init_filepath_mapping(seasons: List[RequestGetTvSeasonDetails.Response]) ->
     }
 
 
-def get_episode_key(episode: RequestGetTvSeasonDetails.FieldEpisodesItem) -> str:
-    return f'S{episode["season_number"]:02d}E{episode["episode_number"]:02d}'
-
-
 # endregion Helper functions
@@ -31,6 +31,17 @@ class TvListItem(BaseModel):
         return value.strftime("%Y-%m-%d %H:%M:%S")
 
 
+class TvSearchResult(BaseModel):
+    total: int = Field(..., description="总数", ge=0)
+    page: int = Field(..., description="页码", ge=1)
+    page_size: int = Field(..., description="每页数量", ge=1)
+    items: List[TvListItem] = Field(..., description="结果")
+
+
+class TvImportResult(BaseModel):
+    imported: int = Field(..., description="导入数量", ge=0)
+
+
 class Tv(BaseModel):
     class Config:
         from_attributes = True
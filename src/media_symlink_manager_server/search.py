@@ -0,0 +1,165 @@
+import re
+from typing import Any, Dict, List, Tuple
+
+from pony.orm import db_session  # type: ignore[import-untyped]
+
+from media_symlink_manager_server.db import db
+from media_symlink_manager_server.models import TvModel
+
+TV_FTS_TABLE = "tv_fts"
+# Index of the 1 and 2 character grams of every word, for terms too short for the trigram tokenizer
+TV_FTS_SHORT_TABLE = "tv_fts_short"
+TV_FTS_COLUMNS = ["name", "original_name", "year", "episode_names"]
+# bm25 weights, in the same order as TV_FTS_COLUMNS
+TV_FTS_WEIGHTS = [10.0, 10.0, 2.0, 1.0]
+# The trigram tokenizer can only MATCH terms of at least this many characters
+TRIGRAM_MIN_LEN = 3
+REBUILD_CHUNK_SIZE = 200
+
+WORD_PATTERN = re.compile(r"[^\W_]+")
+
+
+def setup_tv_search_index() -> None:
+    """
+    Create the TV full-text indexes and rebuild them if they look out of sync with the tv table.
+
+    Only row counts are compared, which catches missing or new indexes and shows added or
+    deleted behind the index's back, but not a show changed in place without index_tv().
+    Call rebuild_tv_search_index() after such changes.
+
+    Terms of at least three characters are looked up in a trigram index, which gives
+    case-insensitive substring (and therefore prefix) matching and works for CJK text that
+    has no word separators. Shorter terms, e.g. one or two character CJK titles, are looked up
+    as whole tokens in an index of the 1 and 2 character grams of every word.
+    """
+    with db_session:
+        db.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TV_FTS_TABLE} "
+            f"USING fts5({', '.join(TV_FTS_COLUMNS)}, tokenize='trigram')",
+            globals={},
+        )
+        db.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TV_FTS_SHORT_TABLE} "
+            f"USING fts5({', '.join(TV_FTS_COLUMNS)}, tokenize='unicode61')",
+            globals={},
+        )
+        count = TvModel.select().count()
+        out_of_sync = any(
+            db.select(f"SELECT count(*) FROM {table}", globals={})[0] != count
+            for table in [TV_FTS_TABLE, TV_FTS_SHORT_TABLE]
+        )
+    if out_of_sync:
+        rebuild_tv_search_index()
+
+
+def rebuild_tv_search_index(chunk_size: int = REBUILD_CHUNK_SIZE) -> None:
+    """
+    Drop all indexed rows and re-index every stored TV show.
+
+    Rows are read in chunks by keyset pagination, each chunk in its own db_session,
+    so memory stays constant regardless of the library size.
+
+    Args:
+        chunk_size: Number of rows indexed per transaction
+    """
+    with db_session:
+        db.execute(f"DELETE FROM {TV_FTS_TABLE}", globals={})
+        db.execute(f"DELETE FROM {TV_FTS_SHORT_TABLE}", globals={})
+
+    last_tmdb_id = 0
+    while True:
+        with db_session:
+            models = TvModel.select(lambda m: m.tmdb_id > last_tmdb_id).order_by(TvModel.tmdb_id)[:chunk_size]
+            if not models:
+                return
+            for m in models:
+                index_tv(m)
+            last_tmdb_id = models[-1].tmdb_id
+
+
+def index_tv(m: TvModel) -> None:
+    """Insert or replace the index rows of a TV show. Must be called inside a db_session."""
+    row = {
+        "tmdb_id": m.tmdb_id,
+        "name": m.name,
+        "original_name": m.tmdb_tv.get("original_name", ""),
+        "year": str(m.year),
+        "episode_names": "\n".join(episode["name"] for season in m.tmdb_seasons for episode in season["episodes"]),
+    }
+    short_row = {c: short_grams(row[c]) for c in TV_FTS_COLUMNS}
+    short_row["tmdb_id"] = m.tmdb_id
+
+    unindex_tv(m.tmdb_id)
+    for table, params in [(TV_FTS_TABLE, row), (TV_FTS_SHORT_TABLE, short_row)]:
+        db.execute(
+            f"INSERT INTO {table}(rowid, {', '.join(TV_FTS_COLUMNS)}) "
+            f"VALUES ($tmdb_id, {', '.join(f'${c}' for c in TV_FTS_COLUMNS)})",
+            globals={},
+            locals=params,
+        )
+
+
+def unindex_tv(tmdb_id: int) -> None:
+    """Remove the index rows of a TV show. Must be called inside a db_session."""
+    for table in [TV_FTS_TABLE, TV_FTS_SHORT_TABLE]:
+        db.execute(f"DELETE FROM {table} WHERE rowid = $tmdb_id", globals={}, locals={"tmdb_id": tmdb_id})
+
+
+def search_tv_index(query: str, offset: int, limit: int) -> Tuple[int, List[int]]:
+    """
+    Search the TV full-text indexes. Must be called inside a db_session.
+
+    Whitespace separated terms are AND-ed and matched case-insensitively. Terms of at least
+    three characters match any substring, shorter terms match any 1 or 2 character slice of a
+    word. Hits are ranked by bm25 of the trigram index, or of the short gram index when the
+    query only has short terms.
+
+    Args:
+        query: Search query
+        offset: Number of hits to skip
+        limit: Maximum number of hits to return
+
+    Returns:
+        Total number of hits and the TMDB IDs of the requested page, best match first
+    """
+    match_terms = [t for t in query.split() if len(t) >= TRIGRAM_MIN_LEN]
+    short_terms = [w for t in query.split() if len(t) < TRIGRAM_MIN_LEN for w in WORD_PATTERN.findall(t.lower())]
+    if not match_terms and not short_terms:
+        return 0, []
+
+    params: Dict[str, Any] = {"offset": offset, "limit": limit}
+    conditions = []
+    if match_terms:
+        params["match"] = " ".join(quote_fts_term(t) for t in match_terms)
+        conditions.append(f"{TV_FTS_TABLE} MATCH $match")
+    if short_terms:
+        params["short_match"] = " ".join(quote_fts_term(t) for t in short_terms)
+        conditions.append(f"{TV_FTS_SHORT_TABLE} MATCH $short_match")
+
+    # Rank by the trigram index whenever it takes part, its bm25 is the more precise one
+    table = TV_FTS_TABLE if match_terms else TV_FTS_SHORT_TABLE
+    if match_terms and short_terms:
+        conditions[1] = f"rowid IN (SELECT rowid FROM {TV_FTS_SHORT_TABLE} WHERE {conditions[1]})"
+    where = " AND ".join(conditions)
+    order_by = f"bm25({table}, {', '.join(str(w) for w in TV_FTS_WEIGHTS)}), rowid"
+
+    total = db.select(f"SELECT count(*) FROM {table} WHERE {where}", globals={}, locals=params)[0]
+    tmdb_ids = db.select(
+        f"SELECT rowid FROM {table} WHERE {where} ORDER BY {order_by} LIMIT $limit OFFSET $offset",
+        globals={},
+        locals=params,
+    )
+    return total, list(tmdb_ids)
+
+
+def short_grams(text: str) -> str:
+    """Space separated 1 and 2 character grams of every word in text, lower-cased."""
+    grams = set()
+    for word in WORD_PATTERN.findall(text.lower()):
+        grams.update(word)
+        grams.update(word[i : i + 2] for i in range(len(word) - 1))
+    return " ".join(sorted(grams))
+
+
+def quote_fts_term(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
@@ -3,3 +3,9 @@ import os
 TARGET_BASE_DIR_OPTIONS = os.getenv("TARGET_BASE_DIR_OPTIONS", "").splitlines()
 
 FS_SELECT_BASE_DIR = os.getenv("FS_SELECT_BASE_DIR", "/")
+
+WATCH_SOURCE_FILES = os.getenv("WATCH_SOURCE_FILES", "").lower() in ("1", "true", "yes")
+
+WATCH_DEBOUNCE_SECONDS = float(os.getenv("WATCH_DEBOUNCE_SECONDS", "2"))
+
+WATCH_POLL_INTERVAL_SECONDS = float(os.getenv("WATCH_POLL_INTERVAL_SECONDS", "5"))
@@ -0,0 +1,114 @@
+import os
+from dataclasses import dataclass
+from typing import List, Optional, Set
+
+from media_symlink_manager_server.schemas import Tv
+from media_symlink_manager_server.tmdb_client.requests import RequestGetTvSeasonDetails
+from media_symlink_manager_server.utils import avoid_invalid_filename_chars
+
+
+@dataclass
+class SymlinkTask:
+    """Represents a symlink creation task."""
+    src: str  # Source file path
+    dst: str  # Destination symlink path
+
+
+class SymlinkBatchError(Exception):
+    """Raised when batch symlink creation fails due to file conflicts."""
+    def __init__(self, conflicts: List[str]):
+        self.conflicts = conflicts
+        super().__init__(f"Files already exist: {conflicts}")
+
+
+def create_symlinks_atomic(tasks: List[SymlinkTask]) -> None:
+    """
+    Atomically create symlinks in batch.
+
+    - Fails if any target path is a regular file (non-symlink)
+    - Allows overwriting symlinks or creating new ones
+
+    Args:
+        tasks: List of symlink creation tasks
+
+    Raises:
+        SymlinkBatchError: When regular file conflicts are detected
+    """
+    # Phase 1: Validate all target paths
+    conflicts = []
+    for task in tasks:
+        if os.path.lexists(task.dst) and not os.path.islink(task.dst):
+            conflicts.append(task.dst)
+
+    if conflicts:
+        raise SymlinkBatchError(conflicts)
+
+    # Phase 2: Execute all symlink operations
+    created = []
+    try:
+        for task in tasks:
+            # Ensure destination directory exists
+            dst_dir = os.path.dirname(task.dst)
+            if dst_dir:
+                os.makedirs(dst_dir, exist_ok=True)
+
+            # Remove existing symlink
+            if os.path.islink(task.dst):
+                os.remove(task.dst)
+
+            # Create new symlink
+            os.symlink(task.src, task.dst)
+            created.append(task.dst)
+    except OSError:
+        # Rollback created symlinks
+        for dst in created:
+            try:
+                if os.path.islink(dst):
+                    os.remove(dst)
+            except OSError:
+                pass
+        raise
+
+
+def build_tv_symlink_tasks(tv: Tv, keys: Optional[Set[str]] = None) -> List[SymlinkTask]:
+    """
+    Build the symlink tasks of a TV show based on its filepath mapping.
+
+    Args:
+        tv: Tv object
+        keys: Only build tasks for these episode keys, all episodes if None
+
+    Returns:
+        List of symlink creation tasks, episodes without a source file are skipped
+    """
+    base_dir = tv.filepath_mapping["base_dir"]
+    mappings = tv.filepath_mapping["mappings"]
+    tv_dirname = avoid_invalid_filename_chars(f"{tv.name} ({tv.year})")
+
+    # Collect all symlink tasks
+    tasks: List[SymlinkTask] = []
+
+    for season in tv.tmdb_seasons:
+        season_dirname = f"Season {season['season_number']:02d}"
+        season_dirpath = os.path.join(base_dir, tv_dirname, season_dirname)
+
+        for episode in season["episodes"]:
+            key = get_episode_key(episode)
+            if keys is not None and key not in keys:
+                continue
+            src = mappings.get(key, "")
+            if src == "":
+                continue
+
+            ext = os.path.splitext(src)[1]
+            dst = os.path.join(
+                season_dirpath,
+                avoid_invalid_filename_chars(f"{tv.name} ({tv.year}) - {key} - {episode['name']}{ext}"),
+            )
+            tasks.append(SymlinkTask(src=src, dst=dst))
+
+    return tasks
+
+
+def get_episode_key(episode: RequestGetTvSeasonDetails.FieldEpisodesItem) -> str:
+    return f'S{episode["season_number"]:02d}E{episode["episode_number"]:02d}'
@@ -1,7 +1,7 @@
 from typing import List, TYPE_CHECKING, Optional
 
 from pydantic import ConfigDict
-from typing_extensions import TypedDict
+from typing_extensions import TypedDict, NotRequired
 
 from ..utils import first_not_none
 
@@ -14,6 +14,7 @@ class RequestGetTvDetails:
         __pydantic_config__ = ConfigDict(extra="allow")  # type: ignore[misc]
 
         name: str
+        original_name: NotRequired[str]
         first_air_date: str
         seasons: List["RequestGetTvDetails.FieldSeasonsItem"]
 
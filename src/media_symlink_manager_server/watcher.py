@@ -0,0 +1,507 @@
+import copy
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Hashable, List, Optional, Protocol, Set, Tuple
+
+from pony.orm import db_session, select as pony_select  # type: ignore[import-untyped]
+
+from media_symlink_manager_server import settings
+from media_symlink_manager_server.models import TvModel
+from media_symlink_manager_server.schemas import Tv
+from media_symlink_manager_server.symlinks import SymlinkBatchError, build_tv_symlink_tasks, create_symlinks_atomic
+
+logger = logging.getLogger(__name__)
+
+# How long a single backend read may block, bounds the shutdown and resync latency
+READ_TIMEOUT_SECONDS = 0.5
+# Flush a batch after this long or this many events, even if file events keep arriving
+MAX_BATCH_AGE_SECONDS = 30.0
+MAX_BATCH_EVENTS = 50000
+
+
+@dataclass
+class FileEvent:
+    """
+    Represents a file leaving ("from"), entering ("to") or deleted ("deleted") in a watched directory.
+
+    An "overflow" event means events were lost and the watched directories must be reconciled.
+    """
+    kind: str
+    key: Optional[Hashable]  # Pairs both halves of a move, None for deletions
+    path: str
+
+
+class WatchBackend(Protocol):
+    def set_dirs(self, dirs: Set[str]) -> None:
+        ...
+
+    def read_events(self, timeout: float) -> List[FileEvent]:
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+# region inotify backend
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+INOTIFY_WATCH_MASK = IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE | IN_ONLYDIR
+INOTIFY_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class InotifyBackend:
+    """Watches directories with Linux inotify, move halves are paired by the inotify cookie."""
+
+    def __init__(self) -> None:
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._wd_by_dir: Dict[str, int] = {}
+        self._dir_by_wd: Dict[int, str] = {}
+
+    def set_dirs(self, dirs: Set[str]) -> None:
+        for directory in self._wd_by_dir.keys() - dirs:
+            wd = self._wd_by_dir.pop(directory)
+            self._dir_by_wd.pop(wd, None)
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+        for directory in dirs - self._wd_by_dir.keys():
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), INOTIFY_WATCH_MASK)
+            if wd < 0:
+                logger.warning("Cannot watch %s: %s", directory, os.strerror(ctypes.get_errno()))
+                continue
+            self._wd_by_dir[directory] = wd
+            self._dir_by_wd[wd] = directory
+
+    def read_events(self, timeout: float) -> List[FileEvent]:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = INOTIFY_EVENT_HEADER.unpack_from(data, offset)
+            offset += INOTIFY_EVENT_HEADER.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                logger.warning("inotify event queue overflowed, reconciling the watched directories")
+                events.append(FileEvent(kind="overflow", key=None, path=""))
+                continue
+            directory = self._dir_by_wd.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                self._dir_by_wd.pop(wd, None)
+                self._wd_by_dir.pop(directory, None)
+                continue
+
+            path = os.path.join(directory, name)
+            if mask & IN_MOVED_FROM:
+                events.append(FileEvent(kind="from", key=cookie, path=path))
+            elif mask & IN_MOVED_TO:
+                events.append(FileEvent(kind="to", key=cookie, path=path))
+            elif mask & IN_DELETE:
+                events.append(FileEvent(kind="deleted", key=None, path=path))
+        return events
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+# endregion inotify backend
+
+
+# region Polling backend
+class PollingBackend:
+    """
+    Watches directories by diffing listings, move halves are paired by device, inode and size.
+
+    A deletion cannot be told apart from a move out of the watched directories, so this
+    backend never reports deletions.
+    """
+
+    def __init__(self, interval: float) -> None:
+        self._interval = interval
+        self._snapshots: Dict[str, Dict[str, Tuple[int, int, int]]] = {}
+        self._next_scan_at = 0.0
+
+    def set_dirs(self, dirs: Set[str]) -> None:
+        for directory in self._snapshots.keys() - dirs:
+            del self._snapshots[directory]
+        for directory in dirs - self._snapshots.keys():
+            self._snapshots[directory] = scan_dir(directory)
+
+    def read_events(self, timeout: float) -> List[FileEvent]:
+        now = time.monotonic()
+        if now < self._next_scan_at:
+            time.sleep(min(timeout, self._next_scan_at - now))
+            return []
+        self._next_scan_at = now + self._interval
+
+        events = []
+        for directory, old in self._snapshots.items():
+            new = scan_dir(directory)
+            for name in old.keys() - new.keys():
+                events.append(FileEvent(kind="from", key=old[name], path=os.path.join(directory, name)))
+            for name in new.keys() - old.keys():
+                events.append(FileEvent(kind="to", key=new[name], path=os.path.join(directory, name)))
+            self._snapshots[directory] = new
+        return events
+
+    def close(self) -> None:
+        pass
+
+
+def scan_dir(directory: str) -> Dict[str, Tuple[int, int, int]]:
+    entries = {}
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                # A directory's size can change with its contents, so it is paired by inode only
+                entries[entry.name] = (st.st_dev, st.st_ino, 0 if entry.is_dir(follow_symlinks=False) else st.st_size)
+    except OSError:
+        pass
+    return entries
+
+
+# endregion Polling backend
+
+
+class SourceWatcher:
+    """
+    Keeps filepath mappings and applied symlinks current when mapped source files move.
+
+    Runs in a background thread. Events are collected until no new event arrives for the
+    debounce period, or the batch reaches its maximum age or size, then the whole batch is
+    applied as one incremental update.
+    """
+
+    def __init__(
+        self,
+        backend: WatchBackend,
+        debounce_seconds: float,
+        max_batch_age_seconds: float = MAX_BATCH_AGE_SECONDS,
+        max_batch_events: int = MAX_BATCH_EVENTS,
+    ):
+        self._backend = backend
+        self._debounce_seconds = debounce_seconds
+        self._max_batch_age_seconds = max_batch_age_seconds
+        self._max_batch_events = max_batch_events
+        self._dirty = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="source-watcher", daemon=True)
+        # Mapped source path -> [(tmdb_id, episode key)]
+        self._path_index: Dict[str, List[Tuple[int, str]]] = {}
+        # Directory -> mapped source paths directly inside it
+        self._dir_index: Dict[str, List[str]] = {}
+        # Mapped source path -> (st_dev, st_ino), to find moved files again after lost events
+        self._inodes: Dict[str, Tuple[int, int]] = {}
+        self._watched_dirs: Set[str] = set()
+
+    def start(self) -> None:
+        self._dirty.set()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+        self._backend.close()
+
+    def mark_dirty(self) -> None:
+        """Request a reload of the watched directories from the database."""
+        self._dirty.set()
+
+    def _run(self) -> None:
+        pending: List[FileEvent] = []
+        first_event_at = last_event_at = 0.0
+        while not self._stopped.is_set():
+            try:
+                if self._dirty.is_set():
+                    self._dirty.clear()
+                    try:
+                        self._sync()
+                    except Exception:
+                        # Retry on the next iteration rather than running on a stale index
+                        self._dirty.set()
+                        raise
+
+                events = self._backend.read_events(READ_TIMEOUT_SECONDS)
+                if events:
+                    if not pending:
+                        first_event_at = time.monotonic()
+                    pending.extend(events)
+                    last_event_at = time.monotonic()
+
+                now = time.monotonic()
+                if pending and (
+                    now - last_event_at >= self._debounce_seconds
+                    or now - first_event_at >= self._max_batch_age_seconds
+                    or len(pending) >= self._max_batch_events
+                ):
+                    batch, pending = pending, []
+                    self._process(batch)
+            except Exception:
+                logger.exception("Source watcher failed to handle file events")
+                self._stopped.wait(READ_TIMEOUT_SECONDS)
+
+    def _sync(self) -> None:
+        with db_session:
+            # Only load the mappings, not the TMDB metadata of every show
+            rows = pony_select((m.tmdb_id, m.filepath_mapping) for m in TvModel)[:]  # type: ignore[attr-defined]
+
+        path_index: Dict[str, List[Tuple[int, str]]] = {}
+        for tmdb_id, filepath_mapping in rows:
+            for key, src in filepath_mapping["mappings"].items():
+                if src != "":
+                    path_index.setdefault(src, []).append((tmdb_id, key))
+        self._path_index = path_index
+        self._dir_index = {}
+        for src in path_index:
+            self._dir_index.setdefault(os.path.dirname(src), []).append(src)
+
+        # Only stat sources that are new since the last sync
+        inodes = {src: inode for src, inode in self._inodes.items() if src in path_index}
+        for src in path_index.keys() - inodes.keys():
+            try:
+                st = os.stat(src, follow_symlinks=False)
+            except OSError:
+                continue
+            inodes[src] = (st.st_dev, st.st_ino)
+        self._inodes = inodes
+
+        # Grandparents are watched too, so that renaming a release directory can be followed
+        parents = {os.path.dirname(src) for src in path_index}
+        self._watched_dirs = parents | {os.path.dirname(parent) for parent in parents}
+        self._backend.set_dirs(self._watched_dirs)
+
+    def _process(self, events: List[FileEvent]) -> None:
+        moves, moved_out, deleted = pair_file_events(events)
+        if any(event.kind == "overflow" for event in events):
+            for src, dst in self._reconcile_moves().items():
+                moves.setdefault(src, dst)
+            candidates = set(self._path_index)
+            self.mark_dirty()
+        else:
+            candidates = self._affected_sources(events)
+
+        # tmdb_id -> episode key -> (old src, new src), new src is "" when the file was deleted
+        changes: Dict[int, Dict[str, Tuple[str, str]]] = {}
+        for src in candidates:
+            refs = self._path_index[src]
+            # The file may have been replaced under the same name within the batch
+            if os.path.lexists(src):
+                continue
+            moved_to = follow_moves(src, moves)
+            if moved_to is not None:
+                # A file renamed within a directory renamed in the same batch is reported by its old path
+                dst = follow_moves(moved_to, moves) or moved_to
+            elif src in deleted:
+                dst = ""
+            else:
+                if src in moved_out or os.path.dirname(src) in moved_out:
+                    logger.info("Leaving %s unchanged, it was moved out of the watched directories", src)
+                continue
+            if dst != "" and not os.path.lexists(dst):
+                logger.info("Leaving %s unchanged, it was moved on from %s", src, dst)
+                continue
+            for tmdb_id, key in refs:
+                changes.setdefault(tmdb_id, {})[key] = (src, dst)
+
+        if not changes:
+            return
+        for tmdb_id, episode_changes in changes.items():
+            update_tv_sources(tmdb_id, episode_changes)
+        self.mark_dirty()
+
+    def _affected_sources(self, events: List[FileEvent]) -> Set[str]:
+        """Mapped sources that left their path in this batch, themselves or with their directory."""
+        sources = set()
+        for event in events:
+            if event.kind in ("from", "deleted"):
+                if event.path in self._path_index:
+                    sources.add(event.path)
+                sources.update(self._dir_index.get(event.path, []))
+        return sources
+
+    def _reconcile_moves(self) -> Dict[str, str]:
+        """
+        Find missing source files again by inode, for when file events were lost.
+
+        Looks in the watched directories and the sub-directories of the watched grandparents,
+        which covers renamed files and renamed release directories.
+
+        Returns:
+            Moves (src -> dst) of missing sources whose inode was found exactly once
+        """
+        missing = {src: inode for src, inode in self._inodes.items() if not os.path.lexists(src)}
+        if not missing:
+            return {}
+
+        dirs = set(self._watched_dirs)
+        for directory in self._watched_dirs:
+            for name in scan_dir(directory):
+                path = os.path.join(directory, name)
+                if os.path.isdir(path) and not os.path.islink(path):
+                    dirs.add(path)
+
+        paths_by_inode: Dict[Tuple[int, int], List[str]] = {}
+        for directory in dirs:
+            for name, (dev, ino, _) in scan_dir(directory).items():
+                paths_by_inode.setdefault((dev, ino), []).append(os.path.join(directory, name))
+
+        moves = {}
+        for src, inode in missing.items():
+            paths = paths_by_inode.get(inode, [])
+            if len(paths) == 1:
+                moves[src] = paths[0]
+        logger.info("Reconciled %s of %s missing source files", len(moves), len(missing))
+        return moves
+
+
+def pair_file_events(events: List[FileEvent]) -> Tuple[Dict[str, str], Set[str], Set[str]]:
+    """
+    Pair the two halves of every move in a batch of file events.
+
+    Args:
+        events: File events in the order they happened
+
+    Returns:
+        Unambiguous moves (src -> final dst), paths moved out of the watched directories
+        and deleted paths
+    """
+    sources: Dict[Hashable, List[str]] = {}
+    destinations: Dict[Hashable, List[str]] = {}
+    moved_out: Set[str] = set()
+    deleted: Set[str] = set()
+    for event in events:
+        if event.kind == "deleted":
+            deleted.add(event.path)
+        elif event.kind == "from":
+            sources.setdefault(event.key, []).append(event.path)
+        elif event.kind == "to":
+            destinations.setdefault(event.key, []).append(event.path)
+
+    moves: Dict[str, str] = {}
+    for key, srcs in sources.items():
+        dsts = destinations.get(key, [])
+        if not dsts:
+            moved_out.update(srcs)
+        elif len(srcs) == 1 and len(dsts) == 1:
+            moves[srcs[0]] = dsts[0]
+        else:
+            logger.info("Ignoring ambiguous move of %s to %s", srcs, dsts)
+
+    # Follow chained renames within the batch, e.g. a -> b -> c
+    for src, dst in moves.items():
+        seen = {src}
+        while dst in moves and dst not in seen:
+            seen.add(dst)
+            dst = moves[dst]
+        moves[src] = dst
+    return moves, moved_out, deleted
+
+
+def follow_moves(path: str, moves: Dict[str, str]) -> Optional[str]:
+    """New path of a file that was moved itself or whose directory was moved, None if neither."""
+    if path in moves:
+        return moves[path]
+    parent = os.path.dirname(path)
+    if parent in moves:
+        return os.path.join(moves[parent], os.path.basename(path))
+    return None
+
+
+def update_tv_sources(tmdb_id: int, episode_changes: Dict[str, Tuple[str, str]]) -> None:
+    """
+    Update moved source files in the filepath mapping of a TV show and re-apply its symlinks.
+
+    Only episodes whose symlink had already been applied are re-applied.
+
+    Args:
+        tmdb_id: TMDB ID of the TV show
+        episode_changes: Episode key -> (old src, new src), new src is "" when the file is gone
+    """
+    with db_session:
+        m = TvModel.get(tmdb_id=tmdb_id)
+        if m is None:
+            return
+        old_tv = Tv.model_validate(m)
+        filepath_mapping = copy.deepcopy(m.filepath_mapping)
+        keys = set()
+        for key, (old_src, new_src) in episode_changes.items():
+            # Skip episodes re-mapped by the user in the meantime
+            if filepath_mapping["mappings"].get(key) != old_src:
+                continue
+            filepath_mapping["mappings"][key] = new_src
+            keys.add(key)
+        if not keys:
+            return
+        m.filepath_mapping = filepath_mapping
+        tv = Tv.model_validate(m)
+    logger.info("Updated sources of %s episodes of %s (%s)", len(keys), tv.name, tmdb_id)
+
+    applied_keys = set()
+    for key in keys:
+        for task in build_tv_symlink_tasks(old_tv, {key}):
+            if os.path.islink(task.dst):
+                os.remove(task.dst)
+                applied_keys.add(key)
+    if not applied_keys:
+        return
+
+    try:
+        create_symlinks_atomic(build_tv_symlink_tasks(tv, applied_keys))
+    except SymlinkBatchError as e:
+        logger.warning("Cannot re-apply symlinks of %s (%s): %s", tv.name, tmdb_id, e)
+
+
+_watcher: Optional[SourceWatcher] = None
+
+
+def start_source_watcher() -> None:
+    global _watcher
+    backend: WatchBackend
+    try:
+        backend = InotifyBackend()
+    except (OSError, AttributeError) as e:
+        logger.warning("inotify is unavailable (%s), falling back to polling", e)
+        backend = PollingBackend(settings.WATCH_POLL_INTERVAL_SECONDS)
+    _watcher = SourceWatcher(backend, settings.WATCH_DEBOUNCE_SECONDS)
+    _watcher.start()
+
+
+def stop_source_watcher() -> None:
+    global _watcher
+    if _watcher is not None:
+        _watcher.stop()
+        _watcher = None
+
+
+def notify_filepath_mapping_changed() -> None:
+    """Tell the running source watcher, if any, to reload the watched directories."""
+    if _watcher is not None:
+        _watcher.mark_dirty()
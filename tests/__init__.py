@@ -0,0 +1,4 @@
+import os
+import tempfile
+
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "test.db")
@@ -0,0 +1,94 @@
+import gzip
+import json
+import unittest
+from typing import Any, Dict, List
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from media_symlink_manager_server.dependencies import setup_db_from_env
+from media_symlink_manager_server.routers import tv
+
+
+def make_tv(tmdb_id: int) -> Dict[str, Any]:
+    episode = {"name": "Pilot", "season_number": 1, "episode_number": 1}
+    return {
+        "tmdb_id": tmdb_id,
+        "name": f"Show {tmdb_id}",
+        "year": 2020,
+        "tmdb_tv": {"name": f"Show {tmdb_id}", "first_air_date": "2020-01-01", "seasons": []},
+        "tmdb_seasons": [{"name": "Season 1", "season_number": 1, "episodes": [episode]}],
+        "filepath_mapping": {"base_dir": "/", "mappings": {"S01E01": f"/{tmdb_id}.mkv"}, "locked_keys": []},
+        "created_at": "2020-01-01 00:00:00",
+    }
+
+
+def ndjson(tmdb_ids: List[int]) -> bytes:
+    return b"".join(json.dumps(make_tv(tmdb_id)).encode() + b"\n" for tmdb_id in tmdb_ids)
+
+
+class TestTvBackup(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        setup_db_from_env()
+        app = FastAPI()
+        app.include_router(tv.router, prefix="/api")
+        cls.client = TestClient(app)
+
+    def tearDown(self) -> None:
+        for tmdb_id in [7001, 7002, 7011, 7012, 7021, 7022, 7023, 7031]:
+            self.client.delete(f"/api/tv/{tmdb_id}")
+
+    def import_tv(self, body: bytes) -> Any:
+        return self.client.post("/api/tv:import", content=body)
+
+    def exported_ids(self, gzip_export: bool) -> List[int]:
+        response = self.client.get("/api/tv:export", params={"gzip": gzip_export})
+        self.assertEqual(response.status_code, 200)
+        body = gzip.decompress(response.content) if gzip_export else response.content
+        return [json.loads(line)["tmdb_id"] for line in body.splitlines()]
+
+    def test_export_import_round_trip(self) -> None:
+        response = self.import_tv(gzip.compress(ndjson([7001, 7002])))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"imported": 2})
+
+        for gzip_export in [False, True]:
+            exported = self.exported_ids(gzip_export)
+            self.assertIn(7001, exported)
+            self.assertIn(7002, exported)
+
+        updated = make_tv(7001)
+        updated["name"] = "Renamed"
+        self.assertEqual(self.import_tv(json.dumps(updated).encode()).json(), {"imported": 1})
+        self.assertEqual(self.client.get("/api/tv/7001").json()["name"], "Renamed")
+
+    def test_import_duplicate_lines(self) -> None:
+        updated = make_tv(7031)
+        updated["name"] = "Renamed"
+        response = self.import_tv(ndjson([7031]) + json.dumps(updated).encode())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"imported": 2})
+        self.assertEqual(self.client.get("/api/tv/7031").json()["name"], "Renamed")
+
+    def test_import_concatenated_gzip(self) -> None:
+        body = gzip.compress(ndjson([7021, 7022])) + gzip.compress(ndjson([7023]))
+        response = self.import_tv(body)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"imported": 3})
+
+    def test_rejects_invalid_input(self) -> None:
+        response = self.import_tv(b"\x1f\x8bgarbage")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Invalid gzip stream", response.headers["X-Error"])
+
+        response = self.import_tv(gzip.compress(ndjson([7011]))[:-4])
+        self.assertEqual(response.status_code, 400)
+
+        response = self.import_tv(ndjson([7012]) + b"{}\n")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Invalid line 2", response.headers["X-Error"])
+
+        response = self.import_tv(b"\n\n" + ndjson([7012]) + b"\n{}\n")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Invalid line 5", response.headers["X-Error"])
@@ -0,0 +1,61 @@
+import unittest
+from typing import Any, Dict
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from media_symlink_manager_server.dependencies import setup_db_from_env, tmdb_client_from_env
+from media_symlink_manager_server.routers import tv
+from media_symlink_manager_server.search import rebuild_tv_search_index
+
+TV_DETAILS: Dict[int, Dict[str, Any]] = {
+    1396: {"name": "Breaking Bad", "original_name": "Breaking Bad", "first_air_date": "2008-01-20"},
+    1429: {"name": "进击的巨人", "original_name": "進撃の巨人", "first_air_date": "2013-04-07"},
+}
+EPISODE_NAMES: Dict[int, str] = {1396: "Pilot", 1429: "致两千年后的你"}
+
+
+class FakeTmdbClient:
+    def get_tv_details(self, series_id: int) -> Dict[str, Any]:
+        return {**TV_DETAILS[series_id], "seasons": [{"name": "Season 1", "season_number": 1}]}
+
+    def get_tv_season_details(self, series_id: int, season_number: int) -> Dict[str, Any]:
+        episode = {"name": EPISODE_NAMES[series_id], "season_number": season_number, "episode_number": 1}
+        return {"name": "Season 1", "season_number": season_number, "episodes": [episode]}
+
+
+class TestTvSearch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        setup_db_from_env()
+        app = FastAPI()
+        app.include_router(tv.router, prefix="/api")
+        app.dependency_overrides[tmdb_client_from_env] = FakeTmdbClient
+        cls.client = TestClient(app)
+
+    def search(self, query: str) -> list[int]:
+        response = self.client.get("/api/tv:search", params={"query": query})
+        self.assertEqual(response.status_code, 200)
+        return [item["tmdb_id"] for item in response.json()["items"]]
+
+    def test_add_search_delete(self) -> None:
+        for tmdb_id in TV_DETAILS:
+            self.assertEqual(self.client.put(f"/api/tv/{tmdb_id}").status_code, 201)
+
+        self.assertEqual(self.search("bad"), [1396])
+        self.assertEqual(self.search("BREAK"), [1396])
+        self.assertEqual(self.search("pilot"), [1396])
+        self.assertEqual(self.search("ba"), [1396])
+        self.assertEqual(self.search("Ba wi"), [])
+        self.assertEqual(self.search("巨人"), [1429])
+        self.assertEqual(self.search("進撃"), [1429])
+        self.assertEqual(self.search("两千年"), [1429])
+        self.assertEqual(self.search("2013 巨"), [1429])
+
+        rebuild_tv_search_index(chunk_size=1)
+        self.assertEqual(self.search("bad"), [1396])
+        self.assertEqual(self.search("巨人"), [1429])
+
+        self.assertEqual(self.client.delete("/api/tv/1396").status_code, 204)
+        self.assertEqual(self.search("bad"), [])
+        self.assertEqual(self.search("巨人"), [1429])
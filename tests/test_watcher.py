@@ -0,0 +1,193 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from pony.orm import db_session  # type: ignore[import-untyped]
+
+from media_symlink_manager_server.dependencies import setup_db_from_env
+from media_symlink_manager_server.models import TvModel
+from media_symlink_manager_server.schemas import Tv
+from media_symlink_manager_server.symlinks import build_tv_symlink_tasks, create_symlinks_atomic
+from media_symlink_manager_server.watcher import (
+    FileEvent,
+    InotifyBackend,
+    PollingBackend,
+    SourceWatcher,
+    WatchBackend,
+)
+
+
+def wait_until(condition: Callable[[], bool], timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return condition()
+
+
+class SyncedBackend:
+    """Wraps a backend and records when the watcher last handed it the watched directories."""
+
+    def __init__(self, backend: WatchBackend) -> None:
+        self.backend = backend
+        self.synced = threading.Event()
+
+    def set_dirs(self, dirs: Set[str]) -> None:
+        self.backend.set_dirs(dirs)
+        self.synced.set()
+
+    def read_events(self, timeout: float) -> List[FileEvent]:
+        return self.backend.read_events(timeout)
+
+    def close(self) -> None:
+        self.backend.close()
+
+
+class OverflowBackend:
+    """Reports nothing but an event queue overflow, once requested."""
+
+    def __init__(self) -> None:
+        self.overflow = threading.Event()
+
+    def set_dirs(self, dirs: Set[str]) -> None:
+        pass
+
+    def read_events(self, timeout: float) -> List[FileEvent]:
+        if self.overflow.wait(timeout):
+            self.overflow.clear()
+            return [FileEvent(kind="overflow", key=None, path="")]
+        return []
+
+    def close(self) -> None:
+        pass
+
+
+class NoisyBackend:
+    """Wraps a backend and adds an unrelated deletion to every read, so events never settle."""
+
+    def __init__(self, backend: WatchBackend, noise_path: str) -> None:
+        self.backend = backend
+        self.noise_path = noise_path
+
+    def set_dirs(self, dirs: Set[str]) -> None:
+        self.backend.set_dirs(dirs)
+
+    def read_events(self, timeout: float) -> List[FileEvent]:
+        return self.backend.read_events(0.05) + [FileEvent(kind="deleted", key=None, path=self.noise_path)]
+
+    def close(self) -> None:
+        self.backend.close()
+
+
+class TestSourceWatcher(unittest.TestCase):
+    tmdb_id = 9001
+
+    def setUp(self) -> None:
+        setup_db_from_env()
+        self.tmp = tempfile.mkdtemp()
+        self.downloads = os.path.join(self.tmp, "downloads")
+        self.release = os.path.join(self.downloads, "Show.S01")
+        self.elsewhere = os.path.join(self.tmp, "elsewhere")
+        for d in [self.release, self.elsewhere]:
+            os.makedirs(d)
+        mappings = {}
+        for i in range(1, 5):
+            src = os.path.join(self.release, f"e{i}.mkv")
+            with open(src, "w") as f:
+                f.write("x" * i)
+            mappings[f"S01E{i:02d}"] = src
+
+        episodes = [{"name": f"Episode {i}", "season_number": 1, "episode_number": i} for i in range(1, 5)]
+        tv = Tv(
+            tmdb_id=self.tmdb_id,
+            name="Show",
+            year=2020,
+            tmdb_tv={"name": "Show", "first_air_date": "2020-01-01", "seasons": []},
+            tmdb_seasons=[{"name": "Season 1", "season_number": 1, "episodes": episodes}],
+            filepath_mapping={"base_dir": os.path.join(self.tmp, "library"), "mappings": mappings, "locked_keys": []},
+        )
+        with db_session:
+            tv.to_model()
+        create_symlinks_atomic(build_tv_symlink_tasks(tv))
+        self.watcher: Optional[SourceWatcher] = None
+
+    def tearDown(self) -> None:
+        if self.watcher is not None:
+            self.watcher.stop()
+        with db_session:
+            TvModel[self.tmdb_id].delete()
+        shutil.rmtree(self.tmp)
+
+    def start_watcher(self, backend: WatchBackend, debounce_seconds: float = 0.2, **kwargs: Any) -> SyncedBackend:
+        """Start a watcher on backend and wait until it has loaded the watched directories."""
+        synced_backend = SyncedBackend(backend)
+        self.watcher = SourceWatcher(synced_backend, debounce_seconds=debounce_seconds, **kwargs)
+        self.watcher.start()
+        self.assertTrue(synced_backend.synced.wait(5))
+        return synced_backend
+
+    def mappings(self) -> Dict[str, str]:
+        with db_session:
+            return dict(TvModel[self.tmdb_id].filepath_mapping["mappings"])
+
+    def link_target(self, key: str) -> str:
+        season_dir = os.path.join(self.tmp, "library", "Show (2020)", "Season 01")
+        for name in os.listdir(season_dir):
+            if f" - {key} - " in name:
+                return os.readlink(os.path.join(season_dir, name))
+        return ""
+
+    def assert_follows_renames_and_keeps_moved_out_files(self, backend: WatchBackend) -> None:
+        synced_backend = self.start_watcher(backend)
+        renamed = os.path.join(self.downloads, "Show S01")
+        synced_backend.synced.clear()
+        os.rename(self.release, renamed)
+        self.assertTrue(wait_until(lambda: self.mappings()["S01E01"] == os.path.join(renamed, "e1.mkv")))
+        self.assertEqual(self.mappings()["S01E03"], os.path.join(renamed, "e3.mkv"))
+        self.assertTrue(wait_until(lambda: self.link_target("S01E03") == os.path.join(renamed, "e3.mkv")))
+
+        # Wait for the watcher to pick up the renamed directory
+        self.assertTrue(synced_backend.synced.wait(5))
+        os.rename(os.path.join(renamed, "e1.mkv"), os.path.join(renamed, "e1b.mkv"))
+        os.rename(os.path.join(renamed, "e2.mkv"), os.path.join(self.elsewhere, "e2.mkv"))
+        self.assertTrue(wait_until(lambda: self.mappings()["S01E01"] == os.path.join(renamed, "e1b.mkv")))
+        self.assertTrue(wait_until(lambda: self.link_target("S01E01") == os.path.join(renamed, "e1b.mkv")))
+        # Moved out of the watched directories: left for the user to re-map
+        self.assertEqual(self.mappings()["S01E02"], os.path.join(renamed, "e2.mkv"))
+        self.assertEqual(self.link_target("S01E02"), os.path.join(renamed, "e2.mkv"))
+
+    def test_inotify_follows_renames(self) -> None:
+        self.assert_follows_renames_and_keeps_moved_out_files(InotifyBackend())
+
+    def test_polling_follows_renames(self) -> None:
+        self.assert_follows_renames_and_keeps_moved_out_files(PollingBackend(interval=0.1))
+
+    def test_inotify_clears_deleted_files(self) -> None:
+        self.start_watcher(InotifyBackend())
+        os.remove(os.path.join(self.release, "e4.mkv"))
+        self.assertTrue(wait_until(lambda: self.mappings()["S01E04"] == ""))
+        self.assertTrue(wait_until(lambda: self.link_target("S01E04") == ""))
+        self.assertEqual(self.mappings()["S01E03"], os.path.join(self.release, "e3.mkv"))
+
+    def test_reconciles_moves_after_overflow(self) -> None:
+        backend = OverflowBackend()
+        self.start_watcher(backend)
+        renamed = os.path.join(self.downloads, "Show S01")
+        os.rename(os.path.join(self.release, "e1.mkv"), os.path.join(self.release, "e1b.mkv"))
+        os.rename(self.release, renamed)
+        backend.overflow.set()
+        self.assertTrue(wait_until(lambda: self.link_target("S01E01") == os.path.join(renamed, "e1b.mkv")))
+        self.assertEqual(self.mappings()["S01E01"], os.path.join(renamed, "e1b.mkv"))
+        self.assertEqual(self.mappings()["S01E04"], os.path.join(renamed, "e4.mkv"))
+
+    def test_flushes_batches_that_never_settle(self) -> None:
+        backend = NoisyBackend(InotifyBackend(), os.path.join(self.elsewhere, "noise.mkv"))
+        self.start_watcher(backend, debounce_seconds=60, max_batch_age_seconds=0.5)
+        os.rename(os.path.join(self.release, "e1.mkv"), os.path.join(self.release, "e1b.mkv"))
+        self.assertTrue(wait_until(lambda: self.link_target("S01E01") == os.path.join(self.release, "e1b.mkv")))
+        self.assertEqual(self.mappings()["S01E01"], os.path.join(self.release, "e1b.mkv"))